@@ -2,6 +2,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
+import functools
 import numpy as np
 from caffe2.python import core, workspace, dataset
 from caffe2.python.dataset import Const
@@ -11,12 +12,148 @@ from caffe2.python.schema import (
 from caffe2.python.test_util import TestCase
 
 
-def _assert_arrays_equal(actual, ref, err_msg):
-    if ref.dtype.kind in ('S', 'O'):
-        np.testing.assert_array_equal(actual, ref, err_msg=err_msg)
-    else:
-        np.testing.assert_allclose(
-            actual, ref, atol=1e-4, rtol=1e-4, err_msg=err_msg)
+_NUMERIC_KINDS = ('f', 'i', 'u')
+
+# contents of the LastNWindowCollector output after 1, 2 and 3 iterations
+_LAST_N_WINDOW_EXPECTED = (
+    [1, 2, 3, 4, 5, 6],
+    [1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6],
+    [3, 4, 5, 6, 5, 6, 1, 2, 3, 4, 5, 6, 1, 2],
+)
+
+
+# flattened fields of the schema used in test_dataset_ops, with their dtypes.
+# See step 1 of the walkthrough in TestDatasetOps.test_dataset_ops.
+_EXPECTED_FIELDS = (
+    ('dense', np.dtype((np.float32, 3))),
+    ('floats:lengths', np.dtype(np.int32)),
+    ('floats:values:keys', np.dtype(np.int32)),
+    ('floats:values:values', np.dtype(np.float32)),
+    ('int_lists:lengths', np.dtype(np.int32)),
+    ('int_lists:values:keys', np.dtype(np.int32)),
+    ('int_lists:values:values:lengths', np.dtype(np.int32)),
+    ('int_lists:values:values:values', np.dtype(np.int64)),
+    ('id_score_pairs:lengths', np.dtype(np.int32)),
+    ('id_score_pairs:values:keys', np.dtype(np.int32)),
+    ('id_score_pairs:values:values:lengths', np.dtype(np.int32)),
+    ('id_score_pairs:values:values:values:ids', np.dtype(np.int64)),
+    ('id_score_pairs:values:values:values:scores', np.dtype(np.float32)),
+    ('metadata:user_id', np.dtype(np.int64)),
+    ('metadata:user_embed', np.dtype((np.float32, 2))),
+    ('metadata:query', np.dtype(str)),
+)
+
+
+# contents of the dataset in test_dataset_ops, one typed array per field.
+# See step 2 of the walkthrough in TestDatasetOps.test_dataset_ops.
+_CONTENTS = (
+    # dense
+    np.array(
+        [[1.1, 1.2, 1.3], [2.1, 2.2, 2.3], [3.1, 3.2, 3.3]], dtype=np.float32),
+    # floats
+    np.array([1, 2, 3], dtype=np.int32),  # len
+    np.array([11, 21, 22, 31, 32, 33], dtype=np.int32),  # key
+    np.array([1.1, 2.1, 2.2, 3.1, 3.2, 3.3], dtype=np.float32),  # value
+    # int lists
+    np.array([2, 0, 1], dtype=np.int32),  # len
+    np.array([11, 12, 31], dtype=np.int32),  # key
+    np.array([2, 4, 3], dtype=np.int32),  # value:len
+    np.array(
+        [111, 112, 121, 122, 123, 124, 311, 312, 313],
+        dtype=np.int64),  # value:value
+    # id score pairs
+    np.array([1, 2, 2], dtype=np.int32),  # len
+    np.array([11, 21, 22, 31, 32], dtype=np.int32),  # key
+    np.array([1, 1, 2, 2, 3], dtype=np.int32),  # value:len
+    np.array(
+        [111, 211, 221, 222, 311, 312, 321, 322, 323],
+        dtype=np.int64),  # value:ids
+    np.array(
+        [11.1, 21.1, 22.1, 22.2, 31.1, 31.2, 32.1, 32.2, 32.3],
+        dtype=np.float32),  # val:score
+    # metadata
+    np.array([123, 234, 456], dtype=np.int64),  # user_id
+    np.array(
+        [[0.2, 0.8], [0.5, 0.5], [0.7, 0.3]], dtype=np.float32),  # user_embed
+    np.array(['dog posts', 'friends who like to', 'posts about ca']),  # query
+)
+
+# top-level entries of the dataset above, as returned by its readers.
+# See step 4 of the walkthrough in TestDatasetOps.test_dataset_ops.
+_ENTRIES_RAW = (
+    (
+        [[1.1, 1.2, 1.3]],  # dense
+        [1], [11], [1.1],  # floats
+        [2], [11, 12], [2, 4], [111, 112, 121, 122, 123, 124],  # intlst
+        [1], [11], [1], [111], [11.1],  # id score pairs
+        [123], [[0.2, 0.8]], ['dog posts'],  # metadata
+    ),
+    (
+        [[2.1, 2.2, 2.3]],  # dense
+        [2], [21, 22], [2.1, 2.2],  # floats
+        [0], [], [], [],  # int list
+        [2], [21, 22], [1, 2], [211, 221, 222], [21.1, 22.1, 22.2],
+        [234], [[0.5, 0.5]], ['friends who like to'],  # metadata
+    ),
+    (
+        [[3.1, 3.2, 3.3]],  # dense
+        [3], [31, 32, 33], [3.1, 3.2, 3.3],  # floats
+        [1], [31], [3], [311, 312, 313],  # int lst
+        [2], [31, 32], [2, 3], [311, 312, 321, 322, 323],
+        [31.1, 31.2, 32.1, 32.2, 32.3],  # id score list
+        [456], [[0.7, 0.3]], ['posts about ca'],  # metadata
+    ),
+)
+
+
+def _assert_strings_equal(actual, ref, err_msg):
+    # fetched strings are object arrays while the expected ones are not, so
+    # only empty fields of the same shape can be accepted without a diff
+    if actual.size == 0 and actual.shape == ref.shape:
+        return
+    np.testing.assert_array_equal(actual, ref, err_msg=err_msg)
+
+
+_assert_numbers_close = functools.partial(
+    np.testing.assert_allclose, atol=1e-4, rtol=1e-4)
+
+
+def _pick_cmp(dtype):
+    """Returns the assertion used to compare fields of the given dtype."""
+    if dtype.base.kind in ('S', 'O'):
+        return _assert_strings_equal
+    return _assert_numbers_close
+
+
+# comparators and numeric flags, keyed by the field types of a schema
+_RECORD_CMPS = {}
+
+
+def _record_cmps(types):
+    """Returns the comparators and numeric flags for the fields of a schema
+    with the given field types, resolving them only once per schema."""
+    key = tuple(types)
+    cmps = _RECORD_CMPS.get(key)
+    if cmps is None:
+        cmps = (
+            tuple(_pick_cmp(t) for t in key),
+            tuple(t.base.kind in _NUMERIC_KINDS for t in key),
+        )
+        _RECORD_CMPS[key] = cmps
+    return cmps
+
+
+def _numeric_fields_close(b1, b2):
+    """Compares two lists of numeric arrays with a single allclose call.
+    Returns False if any of them may differ, without telling which one."""
+    for d1, d2 in zip(b1, b2):
+        if d1.dtype.kind not in _NUMERIC_KINDS or d1.shape != d2.shape:
+            return False
+    if not b2:
+        return True
+    flat_a = np.concatenate([np.ravel(d).astype(np.float64) for d in b1])
+    flat_b = np.concatenate([np.ravel(d).astype(np.float64) for d in b2])
+    return np.allclose(flat_a, flat_b, atol=1e-4, rtol=1e-4)
 
 
 def _assert_records_equal(actual, ref):
@@ -26,8 +163,17 @@ def _assert_records_equal(actual, ref):
     b2 = ref.field_blobs()
     assert(len(b1) == len(b2)), 'Records have different lengths: %d vs. %d' % (
         len(b1), len(b2))
-    for name, d1, d2 in zip(ref.field_names(), b1, b2):
-        _assert_arrays_equal(d1, d2, err_msg='Mismatch in field %s.' % name)
+    names = ref.field_names()
+    cmps, numeric = _record_cmps(ref.field_types())
+    # check all the numeric fields at once, only going field by field to
+    # pinpoint the mismatch
+    fast_ok = _numeric_fields_close(
+        [d for d, n in zip(b1, numeric) if n],
+        [d for d, n in zip(b2, numeric) if n])
+    for i, cmp in enumerate(cmps):
+        if fast_ok and numeric[i]:
+            continue
+        cmp(b1[i], b2[i], err_msg='Mismatch in field %s.' % names[i])
 
 
 class TestDatasetOps(TestCase):
@@ -68,67 +214,27 @@ class TestDatasetOps(TestCase):
 
         """
         This is what the flattened fields for this schema look like, along
-        with its type. Each one of these fields will be stored, read and
-        writen as a tensor.
+        with its type, as listed in _EXPECTED_FIELDS at the top of this
+        module. Each one of these fields will be stored, read and writen as a
+        tensor.
         """
-        expected_fields = [
-            ('dense', (np.float32, 3)),
-            ('floats:lengths', np.int32),
-            ('floats:values:keys', np.int32),
-            ('floats:values:values', np.float32),
-            ('int_lists:lengths', np.int32),
-            ('int_lists:values:keys', np.int32),
-            ('int_lists:values:values:lengths', np.int32),
-            ('int_lists:values:values:values', np.int64),
-            ('id_score_pairs:lengths', np.int32),
-            ('id_score_pairs:values:keys', np.int32),
-            ('id_score_pairs:values:values:lengths', np.int32),
-            ('id_score_pairs:values:values:values:ids', np.int64),
-            ('id_score_pairs:values:values:values:scores', np.float32),
-            ('metadata:user_id', np.int64),
-            ('metadata:user_embed', (np.float32, 2)),
-            ('metadata:query', str),
-        ]
-        zipped = zip(
-            expected_fields,
-            schema.field_names(),
-            schema.field_types())
-        for (ref_name, ref_type), name, dtype in zipped:
-            self.assertEquals(ref_name, name)
-            self.assertEquals(np.dtype(ref_type), dtype)
+        names = schema.field_names()
+        types = schema.field_types()
+        self.assertEquals(len(_EXPECTED_FIELDS), len(names))
+        for i, (ref_name, ref_dtype) in enumerate(_EXPECTED_FIELDS):
+            self.assertEquals(ref_name, names[i])
+            self.assertEquals(ref_dtype, types[i])
 
         """
         2. The contents of our dataset.
 
-        Contents as defined below could represent, for example, a log of
-        search queries along with dense, sparse features and metadata.
-        The datset below has 3 top-level entries.
+        Contents as defined in _CONTENTS could represent, for example, a log
+        of search queries along with dense, sparse features and metadata.
+        The datset, defined in _CONTENTS at the top of this module, has 3
+        top-level entries.
         """
-        contents_raw = [
-            # dense
-            [[1.1, 1.2, 1.3], [2.1, 2.2, 2.3], [3.1, 3.2, 3.3]],
-            # floats
-            [1, 2, 3],  # len
-            [11, 21, 22, 31, 32, 33],  # key
-            [1.1, 2.1, 2.2, 3.1, 3.2, 3.3],  # value
-            # int lists
-            [2, 0, 1],  # len
-            [11, 12, 31],  # key
-            [2, 4, 3],  # value:len
-            [111, 112, 121, 122, 123, 124, 311, 312, 313],  # value:value
-            # id score pairs
-            [1, 2, 2],  # len
-            [11, 21, 22, 31, 32],  # key
-            [1, 1, 2, 2, 3],  # value:len
-            [111, 211, 221, 222, 311, 312, 321, 322, 323],  # value:ids
-            [11.1, 21.1, 22.1, 22.2, 31.1, 31.2, 32.1, 32.2, 32.3],  # val:score
-            # metadata
-            [123, 234, 456],  # user_id
-            [[0.2, 0.8], [0.5, 0.5], [0.7, 0.3]],  # user_embed
-            ['dog posts', 'friends who like to', 'posts about ca'],  # query
-        ]
-        # convert the above content to ndarrays, checking against the schema
-        contents = from_blob_list(schema, contents_raw)
+        # convert the raw content to ndarrays, checking against the schema
+        contents = from_blob_list(schema, _CONTENTS)
 
         """
         3. Creating and appending to the dataset.
@@ -150,36 +256,14 @@ class TestDatasetOps(TestCase):
         4. Iterating through the dataset contents.
 
         If we were to iterate through the top level entries of our dataset,
-        this is what we should expect to see:
+        we should expect to see the ones listed in _ENTRIES_RAW at the top of
+        this module:
         """
-        entries_raw = [
-            (
-                [[1.1, 1.2, 1.3]],  # dense
-                [1], [11], [1.1],  # floats
-                [2], [11, 12], [2, 4], [111, 112, 121, 122, 123, 124],  # intlst
-                [1], [11], [1], [111], [11.1],  # id score pairs
-                [123], [[0.2, 0.8]], ['dog posts'],  # metadata
-            ),
-            (
-                [[2.1, 2.2, 2.3]],  # dense
-                [2], [21, 22], [2.1, 2.2],  # floats
-                [0], [], [], [],  # int list
-                [2], [21, 22], [1, 2], [211, 221, 222], [21.1, 22.1, 22.2],
-                [234], [[0.5, 0.5]], ['friends who like to'],  # metadata
-            ),
-            (
-                [[3.1, 3.2, 3.3]],  # dense
-                [3], [31, 32, 33], [3.1, 3.2, 3.3],  # floats
-                [1], [31], [3], [311, 312, 313],  # int lst
-                [2], [31, 32], [2, 3], [311, 312, 321, 322, 323],
-                [31.1, 31.2, 32.1, 32.2, 32.3],  # id score list
-                [456], [[0.7, 0.3]], ['posts about ca'],  # metadata
-            ),
-            # after the end of the dataset, we will keep getting empty vectors
-            ([],) * 16,
-            ([],) * 16,
-        ]
-        entries = [from_blob_list(schema, e) for e in entries_raw]
+        entries = [from_blob_list(schema, e) for e in _ENTRIES_RAW]
+        # after the end of the dataset, we will keep getting empty vectors,
+        # converted only once since the reads below never modify them
+        empty_entry = from_blob_list(schema, ([],) * 16)
+        entries += [empty_entry] * 2
 
         """
         Let's go ahead and create the reading nets.
@@ -194,8 +278,9 @@ class TestDatasetOps(TestCase):
         workspace.RunNetOnce(read_init_net)
         workspace.CreateNet(read_next_net, True)
 
+        read_next_name = read_next_net.Name()
         for entry in entries:
-            workspace.RunNet(str(read_next_net))
+            workspace.RunNet(read_next_name)
             actual = FetchRecord(batch)
             _assert_records_equal(actual, entry)
 
@@ -219,7 +304,6 @@ class TestDatasetOps(TestCase):
         const_one = Const(process_net, 1000, dtype=np.int32)
         process_net.Add([line_no, const_one], [line_no])
         field = batch.floats.keys.get()
-        process_net.Print(field, [])
         process_net.Add([field, line_no], field, broadcast=1, axis=0)
 
         """ Lets create a second dataset and append to it. """
@@ -244,7 +328,12 @@ class TestDatasetOps(TestCase):
         """
         ds2_data = FetchRecord(ds2.content())
         field = ds2_data.floats.keys
-        field.set(blob=field.get() - [1000, 2000, 2000, 3000, 3000, 3000])
+        # every key was offset by 1000 * its line number
+        lengths = contents.floats.lengths.get()
+        offsets = np.repeat(
+            np.arange(1, len(lengths) + 1, dtype=field.get().dtype) * 1000,
+            lengths)
+        field.set(blob=field.get() - offsets)
         _assert_records_equal(contents, ds2_data)
 
         """
@@ -264,8 +353,8 @@ class TestDatasetOps(TestCase):
         read_init_net = core.Net('read_init')
         read_next_net = core.Net('read_next')
 
-        idx = np.array([2, 1, 0])
-        indices_blob = Const(read_init_net, idx, name='indices')
+        idx = (2, 1, 0)
+        indices_blob = Const(read_init_net, np.array(idx), name='indices')
         reader = ds.random_reader(read_init_net, indices_blob)
         reader.computeoffset(read_init_net)
 
@@ -276,10 +365,11 @@ class TestDatasetOps(TestCase):
 
         workspace.CreateNet(read_next_net, True)
 
+        read_next_name = read_next_net.Name()
         for i in range(len(entries)):
-            k = idx[i] if i in idx else i
+            k = idx[i] if i < len(idx) else i
             entry = entries[k]
-            workspace.RunNet(str(read_next_net))
+            workspace.RunNet(read_next_name)
             actual = FetchRecord(batch)
             _assert_records_equal(actual, entry)
 
@@ -306,11 +396,12 @@ class TestDatasetOps(TestCase):
 
         workspace.CreateNet(read_next_net, True)
 
-        expected_idx = np.array([2, 1, 0])
+        expected_idx = (2, 1, 0)
+        read_next_name = read_next_net.Name()
         for i in range(len(entries)):
-            k = expected_idx[i] if i in expected_idx else i
+            k = expected_idx[i] if i < len(expected_idx) else i
             entry = entries[k]
-            workspace.RunNet(str(read_next_net))
+            workspace.RunNet(read_next_name)
             actual = FetchRecord(batch)
             _assert_records_equal(actual, entry)
 
@@ -333,8 +424,8 @@ class TestDatasetOps(TestCase):
         workspace.RunPlan(plan)
         reference_result = workspace.FetchBlob('output')
         self.assertSequenceEqual(
-            [item for sublist in reference_result for item in sublist],
-            [1, 2, 3, 4, 5, 6])
+            reference_result.ravel().tolist(),
+            _LAST_N_WINDOW_EXPECTED[0])
 
         plan = core.Plan('collect_data')
         plan.AddStep(core.execution_step('collect_data',
@@ -342,8 +433,8 @@ class TestDatasetOps(TestCase):
         workspace.RunPlan(plan)
         reference_result = workspace.FetchBlob('output')
         self.assertSequenceEqual(
-            [item for sublist in reference_result for item in sublist],
-            [1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6])
+            reference_result.ravel().tolist(),
+            _LAST_N_WINDOW_EXPECTED[1])
 
         plan = core.Plan('collect_data')
         plan.AddStep(core.execution_step('collect_data',
@@ -351,39 +442,37 @@ class TestDatasetOps(TestCase):
         workspace.RunPlan(plan)
         reference_result = workspace.FetchBlob('output')
         self.assertSequenceEqual(
-            [item for sublist in reference_result for item in sublist],
-            [3, 4, 5, 6, 5, 6, 1, 2, 3, 4, 5, 6, 1, 2])
+            reference_result.ravel().tolist(),
+            _LAST_N_WINDOW_EXPECTED[2])
 
     def test_collect_tensor_ops(self):
         init_net = core.Net('init_net')
         blobs = ['blob_1', 'blob_2', 'blob_3']
         bvec_map = {}
         ONE = init_net.ConstantFill([], 'ONE', shape=[1, 2], value=1)
+        counter = init_net.ConstantFill([], 'counter', shape=[1, 2], value=0)
         for b in blobs:
-            init_net.ConstantFill([], [b], shape=[1, 2], value=0)
             bvec_map[b] = b + '_vec'
             init_net.CreateTensorVector([], [bvec_map[b]])
 
-        reader_net = core.Net('reader_net')
-        for b in blobs:
-            reader_net.Add([b, ONE], [b])
-
+        # a single net per iteration: bump the counter shared by all the
+        # inputs, then sample it
         collect_net = core.Net('collect_net')
+        collect_net.Add([counter, ONE], [counter])
+
         num_to_collect = 1000
         max_example_to_cover = 100000
         bvec = [bvec_map[b] for b in blobs]
         collect_net.CollectTensor(
-            bvec + blobs,
+            bvec + [counter] * len(blobs),
             bvec,
             num_to_collect=num_to_collect,
         )
 
-        print('Collect Net Proto: {}'.format(collect_net.Proto()))
-
         plan = core.Plan('collect_data')
         plan.AddStep(core.execution_step('collect_init', init_net))
         plan.AddStep(core.execution_step('collect_data',
-                                         [reader_net, collect_net],
+                                         [collect_net],
                                          num_iter=max_example_to_cover))
         workspace.RunPlan(plan)
 
@@ -409,12 +498,13 @@ class TestDatasetOps(TestCase):
 
         hist, _ = np.histogram(reference_result[:, 0], bins=10,
                                range=(1, max_example_to_cover))
-        print('Sample histogram: {}'.format(hist))
-
         self.assertTrue(all(hist > 0.7 * (num_to_collect / 10)))
+        ref_list = reference_result.tolist()
         for i in range(1, len(blobs)):
             result = workspace.FetchBlob(bconcated_map[blobs[i]])
-            self.assertEqual(reference_result.tolist(), result.tolist())
+            # only build the lists again to report a mismatch
+            if not np.array_equal(reference_result, result):
+                self.assertEqual(ref_list, result.tolist())
 
 if __name__ == "__main__":
     import unittest
@@ -803,6 +803,13 @@ void addGlobalMethods(py::module& m) {
   m.def("fetch_blob", [](const std::string& name) -> py::object {
     return python_detail::fetchBlob(gWorkspace, name);
   });
+  m.def("fetch_blobs", [](const std::vector<std::string>& names) {
+    py::list result;
+    for (const auto& name : names) {
+      result.append(python_detail::fetchBlob(gWorkspace, name));
+    }
+    return result;
+  });
   m.def(
       "feed_blob",
       [](const std::string& name, py::object arg, py::object device_option) {
@@ -89,12 +89,18 @@ class Field(object):
     def __init__(self, children):
         """Derived classes must call this after their initialization."""
         self._parent = (None, 0)
+        # Flattened field_names()/field_types()/field_blobs() of this field.
+        # Names only depend on the structure of the schema; types and blobs
+        # are dropped whenever one of the underlying scalars is changed.
+        self._field_cache = {}
         offset = 0
         self._field_offsets = []
         for child in children:
             self._field_offsets.append(offset)
             offset += len(child.field_names())
         self._field_offsets.append(offset)
+        # The structure is fixed from now on, so flatten the names eagerly.
+        self.field_names()
 
     def clone_schema(self):
         return self.clone(keep_blobs=False)
@@ -134,6 +140,23 @@ class Field(object):
     def _set_parent(self, parent, relative_id):
         self._parent = (parent, relative_id)
 
+    def _cached_field_list(self, key, compute):
+        """Returns a copy of the flattened list `key`, computing it only once
+        until the cache is invalidated."""
+        cached = self._field_cache.get(key)
+        if cached is None:
+            cached = tuple(compute())
+            self._field_cache[key] = cached
+        return list(cached)
+
+    def _invalidate_field_cache(self):
+        """Drops the cached types and blobs of this field and its parents."""
+        self._field_cache.pop('types', None)
+        self._field_cache.pop('blobs', None)
+        parent = self._parent[0]
+        if parent is not None:
+            parent._invalidate_field_cache()
+
     def slice(self):
         """
         Returns a slice representing the range of field ids that belong to
@@ -194,18 +217,27 @@ class List(Field):
         Field.__init__(self, [self.lengths, self._items])
 
     def field_names(self):
+        return self._cached_field_list('names', self._flat_field_names)
+
+    def _flat_field_names(self):
         value_fields = self._items.field_names()
         return (
             ['lengths'] + [_join_field_name('values', v) for v in value_fields]
         )
 
     def field_types(self):
+        return self._cached_field_list('types', self._flat_field_types)
+
+    def _flat_field_types(self):
         return self.lengths.field_types() + self._items.field_types()
 
     def field_metadata(self):
         return self.lengths.field_metadata() + self._items.field_metadata()
 
     def field_blobs(self):
+        return self._cached_field_list('blobs', self._flat_field_blobs)
+
+    def _flat_field_blobs(self):
         return self.lengths.field_blobs() + self._items.field_blobs()
 
     def all_scalars(self):
@@ -312,12 +344,18 @@ class Struct(Field):
         return self.fields.items()
 
     def field_names(self):
+        return self._cached_field_list('names', self._flat_field_names)
+
+    def _flat_field_names(self):
         names = []
         for name, field in self.fields.items():
             names += [_join_field_name(name, f) for f in field.field_names()]
         return names
 
     def field_types(self):
+        return self._cached_field_list('types', self._flat_field_types)
+
+    def _flat_field_types(self):
         types = []
         for _, field in self.fields.items():
             types += field.field_types()
@@ -330,6 +368,9 @@ class Struct(Field):
         return metadata
 
     def field_blobs(self):
+        return self._cached_field_list('blobs', self._flat_field_blobs)
+
+    def _flat_field_blobs(self):
         blobs = []
         for _, field in self.fields.items():
             blobs += field.field_blobs()
@@ -494,8 +535,10 @@ class Scalar(Field):
 
     def __init__(self, dtype=None, blob=None, metadata=None):
         self._metadata = None
-        self.set(dtype, blob, metadata)
+        # Scalar has no children, so the base class can be initialized first;
+        # set() relies on it to invalidate the caches of the parent fields.
         Field.__init__(self, [])
+        self.set(dtype, blob, metadata)
 
     def field_names(self):
         return ['']
@@ -554,11 +597,11 @@ class Scalar(Field):
                 "`categorical_limit` can be specified only in integral " + \
                 "fields but got {}".format(self.dtype)
 
-    def set_value(self, blob):
+    def set_value(self, blob, copy=True):
         """Sets only the blob field still validating the existing dtype"""
-        self.set(dtype=self._original_dtype, blob=blob)
+        self.set(dtype=self._original_dtype, blob=blob, copy=copy)
 
-    def set(self, dtype=None, blob=None, metadata=None):
+    def set(self, dtype=None, blob=None, metadata=None, copy=True):
         """Set the type and/or blob of this scalar. See __init__ for details.
 
         Args:
@@ -572,6 +615,9 @@ class Scalar(Field):
                    a string, to either BlobReference(blob) or np.array(blob).
             metadata: optional instance of Metadata, if provided overrides
                       the metadata information of the scalar
+            copy: if False, a C-contiguous numpy.ndarray that already has
+                  the dtype of this scalar is stored without a copy, so
+                  later changes to it are visible through this scalar.
         """
         if blob is not None and isinstance(blob, core.basestring):
             raise ValueError(
@@ -587,10 +633,18 @@ class Scalar(Field):
         # it is actual tensor data, so we will try to cast it to an numpy array.
         if blob is not None and not isinstance(blob, BlobReference):
             if dtype is not None and dtype != np.void:
-                blob = np.array(blob, dtype=dtype.base)
-                # if array is empty we may need to reshape a little
-                if blob.size == 0:
-                    blob = blob.reshape((0, ) + dtype.shape)
+                if isinstance(blob, (list, tuple)) and len(blob) == 0:
+                    blob = np.empty((0, ) + dtype.shape, dtype=dtype.base)
+                else:
+                    # C order lets FeedBlob copy the buffer out without first
+                    # making a contiguous copy of its own
+                    if copy:
+                        blob = np.array(blob, dtype=dtype.base, order='C')
+                    else:
+                        blob = np.asarray(blob, dtype=dtype.base, order='C')
+                    # if array is empty we may need to reshape a little
+                    if blob.size == 0:
+                        blob = blob.reshape((0, ) + dtype.shape)
             else:
                 assert isinstance(blob, np.ndarray), (
                     'Invalid blob type: %s' % str(type(blob)))
@@ -614,6 +668,7 @@ class Scalar(Field):
         )
         self.dtype = dtype
         self._blob = blob
+        self._invalidate_field_cache()
         if metadata is not None:
             self.set_metadata(metadata)
         self._validate_metadata()
@@ -624,6 +679,7 @@ class Scalar(Field):
             self.dtype = np.dtype(dtype)
         else:
             self.dtype = np.dtype(np.void)
+        self._invalidate_field_cache()
         self._validate_metadata()
 
     def id(self):
@@ -823,10 +879,12 @@ def from_column_list(
     return root.get_field()
 
 
-def from_blob_list(schema, values):
+def from_blob_list(schema, values, copy=True):
     """
     Create a schema that clones the given schema, but containing the given
-    list of values.
+    list of values. If `copy` is False, numpy arrays that already have the
+    right dtype and layout are shared with the returned record instead of
+    being copied.
     """
     assert isinstance(schema, Field), 'Argument `schema` must be a Field.'
     if isinstance(values, BlobReference):
@@ -837,7 +895,7 @@ def from_blob_list(schema, values):
         'Values must have %d elements, got %d.' % (len(scalars), len(values))
     )
     for scalar, value in zip(scalars, values):
-        scalar.set_value(value)
+        scalar.set_value(value, copy=copy)
     return record
 
 
@@ -866,16 +924,17 @@ def FetchRecord(blob_record, ws=None):
     """
 
     def fetch(v):
-        if ws is None:
-            return workspace.FetchBlob(str(v))
-        else:
-            return ws.blobs[str(v)].fetch()
+        return ws.blobs[str(v)].fetch()
 
     assert isinstance(blob_record, Field)
     field_blobs = blob_record.field_blobs()
     assert all(isinstance(v, BlobReference) for v in field_blobs)
-    field_arrays = [fetch(value) for value in field_blobs]
-    return from_blob_list(blob_record, field_arrays)
+    if ws is None:
+        field_arrays = workspace.FetchBlobs(field_blobs)
+    else:
+        field_arrays = [fetch(value) for value in field_blobs]
+    # the fetched arrays are not referenced anywhere else, no need to copy
+    return from_blob_list(blob_record, field_arrays, copy=False)
 
 
 def FeedRecord(blob_record, arrays, ws=None):
@@ -288,3 +288,63 @@ class TestDB(unittest.TestCase):
         self.assertFalse('x' in st)
         self.assertFalse('b:c:x' in st)
         self.assertFalse('b:c:d:x' in st)
+
+    def testFieldCacheInvalidation(self):
+        st = schema.Struct(
+            ('a', schema.Scalar(dtype=np.int32)),
+            ('b', schema.List(schema.Scalar(dtype=np.float32))),
+        )
+        names = st.field_names()
+        names.append('x')
+        self.assertEqual(['a', 'b:lengths', 'b:values'], st.field_names())
+        self.assertEqual(np.dtype(np.float32), st.field_types()[2])
+        st.b.value.set_type(np.int64)
+        self.assertEqual(np.dtype(np.int64), st.field_types()[2])
+        st.a.set_value(np.array([1, 2]))
+        st.b.lengths.set_value(np.array([0, 1]))
+        st.b.value.set_value(np.array([3]))
+        self.assertEqual([1, 2], st.field_blobs()[0].tolist())
+        st.a.set_value(np.array([4]))
+        self.assertEqual([4], st.field_blobs()[0].tolist())
+
+    def testEmptyBlob(self):
+        st = schema.Struct(
+            ('a', schema.Scalar((np.float32, 3))),
+            ('b', schema.Scalar(np.float32)),
+        )
+        s = schema.from_blob_list(st, [[], []])
+        self.assertEqual((0, 3), s.a.get().shape)
+        self.assertEqual(np.dtype(np.float32), s.a.get().dtype)
+        self.assertEqual((0, ), s.b.get().shape)
+        # every scalar gets its own writeable array
+        self.assertTrue(s.a.get().flags.writeable)
+        self.assertTrue(s.b.get().flags.writeable)
+        s2 = schema.from_blob_list(st, [[], []])
+        self.assertFalse(s.a.get() is s2.a.get())
+        self.assertFalse(s.b.get() is s2.b.get())
+
+    def testBlobAliasing(self):
+        values = np.array([1, 2, 3], dtype=np.int32)
+        st = schema.Struct(('x', schema.Scalar(np.int32, values)))
+        clone = st.clone()
+        values[0] = 99
+        # scalars, structs and clones own a copy of the given arrays
+        self.assertEqual([1, 2, 3], st.x.get().tolist())
+        self.assertEqual([1, 2, 3], clone.x.get().tolist())
+        clone.x.get()[1] = 98
+        self.assertEqual([1, 2, 3], st.x.get().tolist())
+
+        record = schema.from_blob_list(st, [values])
+        self.assertFalse(record.x.get() is values)
+        record = schema.from_blob_list(st, [values], copy=False)
+        self.assertTrue(record.x.get() is values)
+        # a different dtype or layout still gets converted into a new array
+        self.assertFalse(
+            schema.from_blob_list(
+                schema.Scalar(np.int64), [values], copy=False).get()
+            is values)
+        matrix = np.array([[1, 2], [3, 4]], dtype=np.int32)
+        transposed = schema.from_blob_list(
+            schema.Scalar((np.int32, 2)), [matrix.T], copy=False).get()
+        self.assertTrue(transposed.flags.c_contiguous)
+        self.assertEqual(matrix.T.tolist(), transposed.tolist())
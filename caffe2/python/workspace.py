@@ -270,7 +270,7 @@ def FetchBlobs(names):
     Returns:
         list of fetched blobs
     """
-    return [FetchBlob(name) for name in names]
+    return C.fetch_blobs([StringifyBlobName(name) for name in names])
 
 
 def FetchBlob(name):